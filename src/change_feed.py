@@ -0,0 +1,229 @@
+import json
+import os
+import logging
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import Optional
+
+fcntl: Optional[ModuleType]
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; appends are then only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Settings are read when a journal or feed is created rather than at import time, so the importer's .env applies
+DEFAULT_CHANGE_JOURNAL_FILE = os.path.join(tempfile.gettempdir(), "openbayanmesh_changes.jsonl")
+DEFAULT_CHANGE_JOURNAL_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_CHANGE_FEED_BUFFER_SIZE = 1000
+DEFAULT_CHANGE_NOTICE_MAX_IDS = 100
+
+
+def _journal_path():
+    return os.getenv("CHANGE_JOURNAL_FILE") or DEFAULT_CHANGE_JOURNAL_FILE
+
+
+def build_change_notice(op, nodes, relationships, max_ids=None):
+    """Summarizes a committed batch as a compact per-domain notice for the change journal.
+
+    For every label the batch touched, the notice holds the number of nodes written, the number of
+    relationships starting or ending at that label, and the ids of up to ``max_ids`` affected nodes.
+    Notices stay small however large the batch was, which bounds the memory of the API's ring buffer.
+    """
+    max_ids = max_ids or int(os.getenv("CHANGE_NOTICE_MAX_IDS", str(DEFAULT_CHANGE_NOTICE_MAX_IDS)))
+    domains = {}
+
+    def summary(label):
+        return domains.setdefault(label, {"nodes": 0, "relationships": 0, "ids": [], "ids_truncated": False})
+
+    def add_id(label, node_id):
+        ids = summary(label)["ids"]
+        if node_id is None or node_id in ids:
+            return
+        if len(ids) < max_ids:
+            ids.append(node_id)
+        else:
+            summary(label)["ids_truncated"] = True
+
+    for node in nodes:
+        summary(node["label"])["nodes"] += 1
+        add_id(node["label"], node.get("id"))
+    for rel in relationships:
+        for label in {rel["source_label"], rel["target_label"]}:
+            summary(label)["relationships"] += 1
+        add_id(rel["source_label"], rel.get("source_id"))
+        add_id(rel["target_label"], rel.get("target_id"))
+    return {"op": op, "domains": domains}
+
+
+def _read_last_line(path):
+    """Reads the last line of a file without scanning it from the start."""
+    try:
+        with open(path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            chunk = b""
+            while position > 0:
+                step = min(8192, position)
+                position -= step
+                f.seek(position)
+                chunk = f.read(step) + chunk
+                # Skip the newline that terminates the last line
+                newline = chunk.rfind(b"\n", 0, len(chunk) - 1)
+                if newline != -1:
+                    return chunk[newline + 1:].decode()
+            return chunk.decode() or None
+    except FileNotFoundError:
+        return None
+
+
+class ChangeJournal:
+    """Append-only JSON Lines file of committed import batches, written by the importer.
+
+    Each entry gets the next sequence id under an exclusive file lock, so ids stay ordered across
+    writer threads and importer processes. Once the file grows past ``max_bytes`` it is rotated to
+    ``<path>.1`` and numbering continues in the new file.
+    """
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or _journal_path()
+        self.max_bytes = max_bytes or int(os.getenv("CHANGE_JOURNAL_MAX_BYTES", str(DEFAULT_CHANGE_JOURNAL_MAX_BYTES)))
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        """Appends an entry and returns its sequence id, or None if the journal could not be written."""
+        try:
+            with self._lock, open(f"{self.path}.lock", 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                seq = self._last_seq() + 1
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+                record = {"seq": seq, "committed_at": datetime.now(timezone.utc).isoformat(), **entry}
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+                return seq
+        except OSError as e:
+            logger.warning(f"Could not append to change journal {self.path}: {e}")
+            return None
+
+    def _last_seq(self):
+        for path in (self.path, f"{self.path}.1"):
+            last_line = _read_last_line(path)
+            if last_line:
+                try:
+                    return json.loads(last_line)["seq"]
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Ignoring unreadable last entry in change journal {path}: {e}")
+        return 0
+
+
+class ChangeFeed:
+    """Tails the change journal into a bounded in-memory ring buffer for ``/v1/changes`` subscribers.
+
+    ``refresh`` only costs an ``os.stat`` when nothing was appended, so subscribers can call it on
+    every poll. Clients that fall further behind than the buffer reaches are told to re-query.
+    """
+
+    def __init__(self, path=None, buffer_size=None):
+        self.path = path or _journal_path()
+        buffer_size = buffer_size or int(os.getenv("CHANGE_FEED_BUFFER_SIZE", str(DEFAULT_CHANGE_FEED_BUFFER_SIZE)))
+        self.buffer = deque(maxlen=buffer_size)
+        self._stat_key = None
+        self._inode = None
+        self._first_seq = None
+        self._offset = 0
+        self._partial = b""
+
+    def latest_seq(self):
+        return self.buffer[-1]["seq"] if self.buffer else 0
+
+    def oldest_seq(self):
+        return self.buffer[0]["seq"] if self.buffer else 0
+
+    def refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        stat_key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if stat_key == self._stat_key:
+            return
+
+        # Files are told apart by their first sequence id because inodes are reused after rotation
+        first_seq = self._first_seq_of(self.path)
+        if first_seq is None:
+            return  # The first entry is still being written
+        if first_seq != self._first_seq:
+            if self._first_seq is not None:
+                # The journal was rotated; finish the old file before switching to the new one
+                self._finish_rotated_file()
+            self._inode, self._first_seq, self._offset, self._partial = stat.st_ino, first_seq, 0, b""
+        self._stat_key = stat_key
+        if stat.st_size > self._offset:
+            self._offset = self._read_entries(self.path, self._offset)
+
+    def entries_since(self, seq, domain):
+        """Returns ``(entries, gap)`` with the buffered entries after ``seq`` that touch ``domain``.
+
+        ``gap`` is True when entries after ``seq`` have already left the buffer, or when ``seq``
+        is ahead of the journal because it was reset.
+        """
+        domain = domain.upper()
+        gap = bool(self.buffer) and (seq < self.oldest_seq() - 1 or seq > self.latest_seq())
+        entries = [self._for_domain(e, domain) for e in self.buffer if e["seq"] > seq and domain in e["domains"]]
+        return entries, gap
+
+    def _finish_rotated_file(self):
+        rotated = f"{self.path}.1"
+        try:
+            same_file = os.stat(rotated).st_ino == self._inode and self._first_seq_of(rotated) == self._first_seq
+            # Anything already buffered is skipped by sequence id, so re-reading the whole file is safe
+            self._read_entries(rotated, self._offset if same_file else 0, self._partial if same_file else b"")
+        except FileNotFoundError:
+            pass
+        self._partial = b""
+
+    @staticmethod
+    def _first_seq_of(path):
+        try:
+            with open(path, 'rb') as f:
+                return json.loads(f.readline())["seq"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _read_entries(self, path, offset, partial=None):
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = (self._partial if partial is None else partial) + f.read()
+            offset = f.tell()
+        lines = data.split(b"\n")
+        # Keep an incomplete trailing line until the writer finishes it
+        self._partial = lines.pop()
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                logger.warning(f"Skipping unreadable change journal entry: {e}")
+                continue
+            if entry.get("seq", 0) > self.latest_seq():
+                self.buffer.append(entry)
+        return offset
+
+    @staticmethod
+    def _for_domain(entry, domain):
+        return {
+            "seq": entry["seq"],
+            "committed_at": entry.get("committed_at"),
+            "domain": domain,
+            "op": entry.get("op"),
+            **entry["domains"][domain],
+        }
+
+
+change_feed = ChangeFeed()
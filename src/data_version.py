@@ -0,0 +1,164 @@
+import json
+import os
+import logging
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import Optional
+
+fcntl: Optional[ModuleType]
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; updates are then only serialized within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_VERSION_FILE = os.path.join(tempfile.gettempdir(), "openbayanmesh_data_versions.json")
+
+
+class DataVersionStore:
+    """Per-domain data version counters kept in a small JSON file.
+
+    The importer bumps a domain's version whenever it commits data for it, and the API bumps
+    versions on schema refreshes and deprecations. Because the counters live in a file, every
+    process on the node sees the same versions, and reading them only costs an ``os.stat`` while
+    the file is unchanged. Versions are taken from one increasing sequence, and the file carries
+    a random epoch so versions are never reused if the file is deleted.
+
+    The file also carries the schema generation and domain deprecations, so an admin change made
+    through one API worker reaches every other worker.
+    """
+
+    def __init__(self, path=None):
+        # Read here rather than at import time, so the importer's .env is applied even though it is loaded later
+        self.path = path or os.getenv("DATA_VERSION_FILE") or DEFAULT_DATA_VERSION_FILE
+        self._lock = threading.Lock()
+        self._cache = None
+        self._cache_key = None
+
+    def bump(self, domains, change=None):
+        """Marks the given domains as changed, applying ``change`` to the state in the same update.
+
+        Returns the updated state, or None if nothing was written. Errors are logged rather than raised.
+        """
+        domains = {d.upper() for d in domains}
+        if not domains and change is None:
+            return None
+
+        def mutate(state):
+            now = datetime.now(timezone.utc).isoformat()
+            state["sequence"] += 1
+            state["updated_at"] = now
+            for domain in domains:
+                state["domains"][domain] = {"version": state["sequence"], "updated_at": now}
+            if change:
+                change(state)
+
+        try:
+            return self._update(mutate)
+        except OSError as e:
+            logger.warning(f"Could not update data versions in {self.path}: {e}")
+            return None
+
+    def record_schema_refresh(self, domains):
+        """Bumps ``domains`` and the schema generation. Returns the new generation, or None on error."""
+        def change(state):
+            state["schema_generation"] = state.get("schema_generation", 0) + 1
+
+        state = self.bump(domains, change)
+        return state["schema_generation"] if state else None
+
+    def record_deprecation(self, domain, sunset_date):
+        """Marks ``domain`` as deprecated for every process and bumps its version."""
+        def change(state):
+            state.setdefault("deprecations", {})[domain.upper()] = {"sunset_date": sunset_date}
+
+        self.bump([domain], change)
+
+    def schema_state(self):
+        """Returns ``(token, schema_generation, deprecations)`` without creating the file.
+
+        ``token`` changes whenever the file does, so callers can skip re-applying unchanged state.
+        """
+        state = self._read()
+        if state is None:
+            return None, 0, {}
+        return (f"{state['epoch']}-{state['sequence']}", state.get("schema_generation", 0),
+                state.get("deprecations", {}))
+
+    def domain_version(self, domain):
+        """Returns ``(token, last_modified)`` for a single domain."""
+        state = self._state()
+        entry = state["domains"].get(domain.upper())
+        if entry is None:
+            return f"{state['epoch']}-{domain.upper()}-0", datetime.fromisoformat(state["created_at"])
+        return (f"{state['epoch']}-{domain.upper()}-{entry['version']}",
+                datetime.fromisoformat(entry["updated_at"]))
+
+    def global_version(self):
+        """Returns ``(token, last_modified)`` covering every domain."""
+        state = self._state()
+        return f"{state['epoch']}-{state['sequence']}", datetime.fromisoformat(state["updated_at"])
+
+    def _state(self):
+        state = self._read()
+        if state is None:
+            # First use on this node: create the file so every process agrees on the epoch
+            try:
+                self._update(lambda state: None)
+            except OSError as e:
+                logger.warning(f"Could not create data version file {self.path}: {e}")
+                self._cache = self._cache or self._new_state()
+                return self._cache
+            state = self._read()
+        return state
+
+    def _read(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key != self._cache_key:
+            try:
+                with open(self.path, 'r') as f:
+                    state = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Could not read data versions from {self.path}: {e}")
+                return self._cache
+            self._cache, self._cache_key = state, key
+        return self._cache
+
+    def _new_state(self):
+        now = datetime.now(timezone.utc).isoformat()
+        return {"epoch": uuid.uuid4().hex[:12], "sequence": 0, "created_at": now, "updated_at": now, "domains": {}}
+
+    def _update(self, mutate):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self._lock, open(f"{self.path}.lock", 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.path, 'r') as f:
+                    state = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                state = self._new_state()
+            mutate(state)
+            # Write to a temporary file and rename it so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".data_versions-")
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(state, f)
+                # mkstemp creates the file as 0600; the importer and the API may run as different users
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            return state
+
+
+data_versions = DataVersionStore()
@@ -2,6 +2,8 @@ import json
 import os
 import logging
 
+from src.data_version import data_versions
+
 logger = logging.getLogger(__name__)
 
 class DomainManager:
@@ -17,9 +19,32 @@ class DomainManager:
         if self._initialized:
             return
         self.domains = {}
+        self._synced_version = None
+        self._schema_generation = None
         self._initialized = True
         self._load_initial_schemas()
 
+    def _sync_shared_state(self):
+        """Applies schema refreshes and deprecations made through other API workers.
+
+        Both are recorded in the shared data version file, so this only costs an ``os.stat`` while
+        nothing has changed. Deprecations are re-applied after every reload so they survive refreshes.
+        """
+        version, generation, deprecations = data_versions.schema_state()
+        if version is not None and version == self._synced_version:
+            return
+        if self._schema_generation is not None and generation != self._schema_generation:
+            logger.info("Domain schemas were refreshed by another worker; reloading.")
+            self.domains = {}
+            self._load_initial_schemas()
+        self._schema_generation = generation
+        for domain_name, deprecation in deprecations.items():
+            domain = self.domains.get(domain_name)
+            if domain:
+                domain["deprecated"] = True
+                domain["sunset_date"] = deprecation.get("sunset_date")
+        self._synced_version = version
+
     def _load_initial_schemas(self):
         # Placeholder for loading schemas from a predefined location or configuration
         # For now, we can add some mock data or load from a 'schemas' directory
@@ -52,7 +77,12 @@ class DomainManager:
             if key == "connections" and isinstance(value, list):
                 for conn in value:
                     if "type" in conn and "target_label" in conn:
-                        schema["relationships"].append({"type": conn["type"], "target_label": conn["target_label"]})
+                        relationship = {"type": conn["type"], "target_label": conn["target_label"]}
+                        if isinstance(conn.get("properties"), dict):
+                            relationship["properties"] = {
+                                prop: str(type(prop_value).__name__) for prop, prop_value in conn["properties"].items()
+                            }
+                        schema["relationships"].append(relationship)
             elif key != "domain": # 'domain' is used for label, not a property
                 schema["properties"][key] = str(type(value).__name__)
         self.domains[domain_name.upper()] = schema
@@ -63,20 +93,30 @@ class DomainManager:
         if domain:
             domain["deprecated"] = True
             domain["sunset_date"] = sunset_date
+            # Recorded in the shared file so the other workers stop serving the domain too
+            data_versions.record_deprecation(domain_name, sunset_date)
             logger.warning(f"Domain '{domain_name.upper()}' marked as deprecated. Sunset date: {sunset_date or 'N/A'}")
         else:
             logger.warning(f"Attempted to deprecate non-existent domain: {domain_name.upper()}")
 
     def get_all_domains(self) -> dict:
+        self._sync_shared_state()
         return self.domains
 
     def get_domain_schema(self, domain_name: str) -> dict:
+        self._sync_shared_state()
         return self.domains.get(domain_name.upper())
 
     def refresh_schemas(self):
         """Refreshes all schemas, e.g., after an import operation."""
+        previous_domains = list(self.domains)
         self.domains = {}
         self._load_initial_schemas()
+        # Other workers see the new generation and reload their own copies; this one is already current
+        generation = data_versions.record_schema_refresh(previous_domains + list(self.domains))
+        if generation is not None:
+            self._schema_generation = generation
+        self._sync_shared_state()
         logger.info("Domain schemas refreshed.")
 
 domain_manager = DomainManager()
@@ -1,10 +1,34 @@
 import argparse
+import glob
+import itertools
 import json
 import os
 import logging
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 from neo4j import GraphDatabase
-from neo4j.exceptions import ServiceUnavailable, AuthError
+from neo4j.exceptions import ServiceUnavailable, AuthError, SessionExpired, TransientError
+
+try:
+    from src.change_feed import ChangeJournal, build_change_notice
+    from src.data_version import DataVersionStore
+except ImportError:  # Run directly as `python src/importer.py`
+    from change_feed import ChangeJournal, build_change_notice  # type: ignore[no-redef]
+    from data_version import DataVersionStore  # type: ignore[no-redef]
+
+resource: Optional[ModuleType]
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then left out of profiling reports
+    resource = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -12,8 +36,257 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Load environment variables from .env file
 load_dotenv()
 
+GLOB_CHARACTERS = set('*?[')
+RETRYABLE_ERRORS = (TransientError, ServiceUnavailable, SessionExpired)
+
+
+class CommitError(Exception):
+    """A batch failed while committing, so the server may or may not have applied it."""
+
+
+def resolve_input_paths(paths):
+    """Expands files, directories and glob patterns into an ordered, de-duplicated list of JSON files."""
+    resolved = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(glob.glob(os.path.join(path, '*.json')))
+            if not matches:
+                logging.warning(f"No JSON files found in directory: {path}")
+        elif os.path.isfile(path):
+            # Checked before globbing so files with brackets in their names, e.g. station[1].json, are kept
+            matches = [path]
+        elif GLOB_CHARACTERS & set(path):
+            matches = sorted(p for p in glob.glob(path, recursive=True) if os.path.isfile(p))
+            if not matches:
+                logging.warning(f"No files matched pattern: {path}")
+        else:
+            # Plain paths are kept even if missing so the parse stage reports them as failed files
+            matches = [path]
+        for match in matches:
+            if match not in resolved:
+                resolved.append(match)
+    return resolved
+
+
+def apply_mappings(record, mappings):
+    transformed_record = record.copy()
+
+    # Apply renames
+    for old_name, new_name in mappings.get("rename_fields", {}).items():
+        if old_name in transformed_record:
+            transformed_record[new_name] = transformed_record.pop(old_name)
+
+    # Apply type conversions and default values
+    for field, conversion_type in mappings.get("type_conversions", {}).items():
+        if field in transformed_record:
+            try:
+                if conversion_type == "int":
+                    transformed_record[field] = int(transformed_record[field])
+                elif conversion_type == "float":
+                    transformed_record[field] = float(transformed_record[field])
+                elif conversion_type == "bool":
+                    transformed_record[field] = str(transformed_record[field]).lower() in ['true', '1', 't', 'y']
+                elif conversion_type == "date":
+                    # This is a basic date conversion, might need more robust parsing for various formats
+                    transformed_record[field] = datetime.fromisoformat(transformed_record[field].replace('Z', '+00:00'))
+            except ValueError as e:
+                logging.warning(f"Could not convert field '{field}' to type '{conversion_type}': {e}")
+        elif field in mappings.get("default_values", {}):
+            transformed_record[field] = mappings["default_values"][field]
+
+    return transformed_record
+
+
+def parse_file(file_path, mappings):
+    """Loads a JSON file and applies the mappings to every record.
+
+    Runs inside the parse process pool, so it only takes and returns picklable values.
+    Returns a ``(file_path, records, error, timings)`` tuple where ``records`` is None if the file
+    could not be read and ``timings`` holds the seconds spent in the parse and map phases, plus the
+    worker's peak RSS under ``max_rss_kb``. Workers are children of the forkserver rather than of the
+    importer, so the importer can't read their memory use itself.
+    """
+    timings = {"parse": 0.0, "map": 0.0}
+    started = time.perf_counter()
+    try:
+        with open(file_path, 'r') as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        return file_path, None, f"Malformed JSON in {file_path}: {e}", timings
+    except FileNotFoundError:
+        return file_path, None, f"File not found: {file_path}", timings
+    timings["parse"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    records = data if isinstance(data, list) else [data]
+    # Non-dict records are passed through untouched so the writer can report them as malformed
+    records = [apply_mappings(r, mappings) if isinstance(r, dict) else r for r in records]
+    timings["map"] = time.perf_counter() - started
+    timings["max_rss_kb"] = _max_rss_kb()
+    return file_path, records, None, timings
+
+
+def _parse_pool_context():
+    """Start method for the parse pool.
+
+    The writer and progress threads are already running when parse workers start, and forking a
+    multi-threaded process can leave a child stuck on a lock (e.g. a logging handler) that another
+    thread held at fork time. The forkserver forks workers from a clean single-threaded process.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _max_rss_kb():
+    """Peak resident set size of the current process in kilobytes, or None without the resource module."""
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux but in bytes on macOS
+    scale = 1024 if sys.platform == "darwin" else 1
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+
+
+class ImportProfiler:
+    """Collects per-phase and per-batch timings for an import run when ``--profile`` is given.
+
+    Phase times from the parse pool are summed across worker processes, so with several
+    workers they can exceed the wall-clock duration of the run.
+    """
+
+    PHASES = ["parse", "map", "enqueue_wait", "writer_idle", "write_nodes", "link_relationships", "commit"]
+
+    def __init__(self, progress_interval=1.0, progress_stream=sys.stderr):
+        self.progress_interval = progress_interval
+        self.progress_stream = progress_stream
+        self.phases = {phase: 0.0 for phase in self.PHASES}
+        self.batches = []
+        self.retries = 0
+        self.records_written = 0
+        self.parse_workers_max_rss_kb = None
+        self.started_at = None
+        self._started = None
+        self._finished = None
+        self._lock = threading.Lock()
+        self._stop_progress = threading.Event()
+        self._progress_thread = None
+
+    def start(self, importer, total_files):
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._progress_thread = threading.Thread(target=self._progress_loop, args=(importer, total_files),
+                                                 name="import-progress", daemon=True)
+        self._progress_thread.start()
+
+    def stop(self):
+        self._finished = time.perf_counter()
+        self._stop_progress.set()
+        if self._progress_thread:
+            self._progress_thread.join()
+            self.progress_stream.write("\n")
+            self.progress_stream.flush()
+
+    def elapsed(self):
+        if self._started is None:
+            return 0.0
+        return (self._finished or time.perf_counter()) - self._started
+
+    def add_phase(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] += seconds
+
+    def record_parse(self, timings):
+        """Adds a parse worker's phase timings and keeps the largest peak RSS any worker reported."""
+        with self._lock:
+            for phase in ("parse", "map"):
+                self.phases[phase] += timings.get(phase, 0.0)
+            rss = timings.get("max_rss_kb")
+            if rss is not None:
+                self.parse_workers_max_rss_kb = max(self.parse_workers_max_rss_kb or 0, rss)
+
+    def record_batch(self, file_path, records, seconds, timings, retries, committed):
+        with self._lock:
+            for phase, phase_seconds in timings.items():
+                self.phases[phase] += phase_seconds
+            self.retries += retries
+            if committed:
+                self.records_written += records
+            self.batches.append({
+                "file": file_path,
+                "records": records,
+                "seconds": seconds,
+                "records_per_second": records / seconds if seconds else None,
+                "retries": retries,
+                "committed": committed,
+                **timings,
+            })
+
+    def _progress_line(self, importer, total_files):
+        elapsed = self.elapsed()
+        with self._lock:
+            records = self.records_written
+            batches = len(self.batches)
+        rate = records / elapsed if elapsed else 0.0
+        return (f"\r[import] files {importer._files_completed}/{total_files} | batches {batches} | "
+                f"records {records} | {rate:,.0f} rec/s | retries {self.retries} | elapsed {elapsed:.1f}s")
+
+    def _progress_loop(self, importer, total_files):
+        while not self._stop_progress.wait(self.progress_interval):
+            self.progress_stream.write(self._progress_line(importer, total_files))
+            self.progress_stream.flush()
+        self.progress_stream.write(self._progress_line(importer, total_files))
+
+    def build_report(self, importer, settings):
+        duration = self.elapsed()
+        latencies = sorted(b["seconds"] for b in self.batches if b["committed"])
+        return {
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "duration_seconds": duration,
+            "settings": settings,
+            "totals": {
+                "files": len(importer.file_stats),
+                "records_written": self.records_written,
+                "successful_imports": importer.successful_imports,
+                "failed_imports": importer.failed_imports,
+                "records_per_second": self.records_written / duration if duration else None,
+                "batches": len(self.batches),
+                "failed_batches": sum(1 for b in self.batches if not b["committed"]),
+                "retries": self.retries,
+            },
+            "phases_seconds": dict(self.phases),
+            "transaction_latency_seconds": {
+                "p50": _percentile(latencies, 50),
+                "p90": _percentile(latencies, 90),
+                "p95": _percentile(latencies, 95),
+                "p99": _percentile(latencies, 99),
+                "max": latencies[-1] if latencies else None,
+                "mean": sum(latencies) / len(latencies) if latencies else None,
+            },
+            "peak_rss_kb": None if resource is None else {
+                "importer": _max_rss_kb(),
+                "parse_workers": self.parse_workers_max_rss_kb,
+            },
+            "files": {path: {k: v for k, v in stats.items() if k != "pending_batches"}
+                      for path, stats in importer.file_stats.items()},
+            "batches": self.batches,
+        }
+
+    def write_report(self, report_path, importer, settings):
+        with open(report_path, 'w') as f:
+            json.dump(self.build_report(importer, settings), f, indent=2)
+        logging.info(f"Wrote import profiling report to {report_path}")
+
+
 class Neo4jImporter:
-    def __init__(self, uri, user, password):
+    def __init__(self, uri, user, password, max_retries=2, profiler=None, data_versions=None, change_journal=None):
         self.driver = None
         try:
             self.driver = GraphDatabase.driver(uri, auth=(user, password))
@@ -31,7 +304,14 @@ class Neo4jImporter:
 
         self.successful_imports = 0
         self.failed_imports = 0
+        self.file_stats = {}
         self.mappings = {}
+        self.max_retries = max_retries
+        self.profiler = profiler
+        self.data_versions = data_versions or DataVersionStore()
+        self.change_journal = change_journal or ChangeJournal()
+        self._stats_lock = threading.Lock()
+        self._files_completed = 0
 
     def close(self):
         if self.driver:
@@ -39,122 +319,250 @@ class Neo4jImporter:
             logging.info("Neo4j connection closed.")
 
     def import_data(self, file_path, domain_type, merge_on_conflict=False, batch_size=1000):
-        logging.info(f"Starting import for file: {file_path} with domain: {domain_type}")
+        self.import_files([file_path], domain_type, merge_on_conflict, batch_size, workers=1, writers=1)
+
+    def import_files(self, file_paths, domain_type, merge_on_conflict=False, batch_size=1000,
+                     workers=None, writers=1, queue_size=8):
+        """Imports several files through a parse process pool feeding a bounded queue of batches.
+
+        Files are parsed and mapped in up to ``workers`` processes. Their batches are consumed by
+        ``writers`` threads, each holding one Neo4j session for the whole run. At most ``queue_size``
+        batches wait in memory, so parsing blocks when the writers fall behind.
+
+        With several writers, batches commit in parallel: a connection can't link to a node from a
+        batch another writer hasn't committed yet, and concurrent MERGEs on the same ids can deadlock.
+        """
+        total_files = len(file_paths)
+        logging.info(f"Starting import of {total_files} file(s) with domain: {domain_type}")
+        for file_path in file_paths:
+            self.file_stats.setdefault(file_path, {"successful": 0, "failed": 0, "records": 0, "pending_batches": 0})
+
+        batch_queue = queue.Queue(maxsize=queue_size)
+        writer_threads = [
+            threading.Thread(target=self._writer_loop, args=(batch_queue, domain_type, merge_on_conflict, total_files),
+                             name=f"neo4j-writer-{i}", daemon=True)
+            for i in range(max(1, writers))
+        ]
+        for thread in writer_threads:
+            thread.start()
+
+        max_workers = workers or os.cpu_count() or 1
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-        except json.JSONDecodeError as e:
-            logging.error(f"Malformed JSON in {file_path}: {e}")
-            self.failed_imports += 1
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=_parse_pool_context()) as executor:
+                # Only keep a couple of files per worker in flight so parsed records don't pile up in memory
+                remaining = iter(file_paths)
+                in_flight = {executor.submit(parse_file, p, self.mappings): p
+                             for p in itertools.islice(remaining, max_workers * 2)}
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        file_path = in_flight.pop(future)
+                        try:
+                            _, records, error, timings = future.result()
+                        except Exception as e:
+                            records, error, timings = None, f"Parse worker failed for {file_path}: {e}", {}
+                        if self.profiler:
+                            self.profiler.record_parse(timings)
+                        self._enqueue_file(file_path, records, error, batch_queue, batch_size, total_files)
+                        next_path = next(remaining, None)
+                        if next_path is not None:
+                            in_flight[executor.submit(parse_file, next_path, self.mappings)] = next_path
+        finally:
+            for _ in writer_threads:
+                batch_queue.put(None)
+            for thread in writer_threads:
+                thread.join()
+
+    def _enqueue_file(self, file_path, records, error, batch_queue, batch_size, total_files):
+        if records is None:
+            logging.error(error)
+            self._record_result(file_path, failed=1)
+            self._finish_file(file_path, total_files)
             return
-        except FileNotFoundError:
-            logging.error(f"File not found: {file_path}")
-            self.failed_imports += 1
+
+        total_records = len(records)
+        batches = [records[i:i + batch_size] for i in range(0, total_records, batch_size)]
+        with self._stats_lock:
+            self.file_stats[file_path]["records"] = total_records
+            # Set before queueing anything so a fast writer can't see the count reach zero early
+            self.file_stats[file_path]["pending_batches"] = len(batches)
+        logging.info(f"Parsed {file_path}: found {total_records} records in {len(batches)} batch(es).")
+
+        if not batches:
+            self._finish_file(file_path, total_files)
             return
+        for batch in batches:
+            started = time.perf_counter()
+            batch_queue.put((file_path, batch))
+            if self.profiler:
+                self.profiler.add_phase("enqueue_wait", time.perf_counter() - started)
 
-        records_to_process = []
-        if isinstance(data, list):
-            records_to_process = data
-        else:
-            records_to_process = [data]
+    def _writer_loop(self, batch_queue, domain_type, merge_on_conflict, total_files):
+        with self.driver.session() as session:
+            while True:
+                started = time.perf_counter()
+                item = batch_queue.get()
+                if self.profiler:
+                    self.profiler.add_phase("writer_idle", time.perf_counter() - started)
+                if item is None:
+                    break
+                file_path, batch = item
+                try:
+                    self._process_batch(batch, domain_type, merge_on_conflict, session, file_path)
+                finally:
+                    with self._stats_lock:
+                        self.file_stats[file_path]["pending_batches"] -= 1
+                        file_done = self.file_stats[file_path]["pending_batches"] == 0
+                    if file_done:
+                        self._finish_file(file_path, total_files)
 
-        total_records = len(records_to_process)
-        logging.info(f"Found {total_records} records to process.")
+    def _record_result(self, file_path, successful=0, failed=0):
+        with self._stats_lock:
+            self.successful_imports += successful
+            self.failed_imports += failed
+            self.file_stats[file_path]["successful"] += successful
+            self.file_stats[file_path]["failed"] += failed
 
-        for i in range(0, total_records, batch_size):
-            batch = records_to_process[i:i + batch_size]
-            self._process_batch(batch, domain_type, merge_on_conflict)
+    def _finish_file(self, file_path, total_files):
+        with self._stats_lock:
+            self._files_completed += 1
+            completed = self._files_completed
+            stats = self.file_stats[file_path]
+        logging.info(f"Finished {file_path} ({completed}/{total_files} files): "
+                     f"{stats['successful']} successful, {stats['failed']} failed.")
 
     def _apply_mappings(self, record):
-        transformed_record = record.copy()
-
-        # Apply renames
-        for old_name, new_name in self.mappings.get("rename_fields", {}).items():
-            if old_name in transformed_record:
-                transformed_record[new_name] = transformed_record.pop(old_name)
+        return apply_mappings(record, self.mappings)
 
-        # Apply type conversions and default values
-        for field, conversion_type in self.mappings.get("type_conversions", {}).items():
-            if field in transformed_record:
-                try:
-                    if conversion_type == "int":
-                        transformed_record[field] = int(transformed_record[field])
-                    elif conversion_type == "float":
-                        transformed_record[field] = float(transformed_record[field])
-                    elif conversion_type == "bool":
-                        transformed_record[field] = str(transformed_record[field]).lower() in ['true', '1', 't', 'y']
-                    elif conversion_type == "date":
-                        # This is a basic date conversion, might need more robust parsing for various formats
-                        from datetime import datetime
-                        transformed_record[field] = datetime.fromisoformat(transformed_record[field].replace('Z', '+00:00'))
-                except ValueError as e:
-                    logging.warning(f"Could not convert field '{field}' to type '{conversion_type}': {e}")
-            elif field in self.mappings.get("default_values", {}):
-                transformed_record[field] = self.mappings["default_values"][field]
-
-        return transformed_record
-
-    def _process_batch(self, batch, domain_type, merge_on_conflict):
-        with self.driver.session() as session:
-            tx = None
+    def _process_batch(self, batch, domain_type, merge_on_conflict, session, file_path):
+        retries = 0
+        while True:
+            started = time.perf_counter()
             try:
-                tx = session.begin_transaction()
-                for record in batch:
-                    if not isinstance(record, dict):
-                        logging.warning(f"Skipping malformed record (not a dictionary): {record}")
-                        self.failed_imports += 1
-                        continue
-
-                    # Apply mappings and normalization
-                    processed_record = self._apply_mappings(record)
-
-                    record_identifier = processed_record.get('id') or processed_record.get('name') or processed_record.get('uuid')
-                    if not record_identifier:
-                        logging.warning(f"Record missing common identifier (id, name, or uuid) after mapping: {processed_record}")
-
-                    properties = {k: v for k, v in processed_record.items() if k not in ['domain', 'connections']}
-                    label = domain_type
-
-                    # Create/Merge Node
-                    query_verb = "MERGE" if merge_on_conflict else "CREATE"
-                    if merge_on_conflict and 'id' in properties:
-                        node_query = f"{query_verb} (n:{label} {{id: $props.id}})
-                                       ON CREATE SET n = $props
-                                       ON MATCH SET n = $props"
-                    else:
-                        node_query = f"CREATE (n:{label} $props)"
-
-                    tx.run(node_query, props=properties)
-                    self.successful_imports += 1
-                    logging.debug(f"Successfully processed node for domain {domain_type}: {record_identifier or 'no-id'}")
-
-                    # Process Relationships
-                    if 'connections' in processed_record and isinstance(processed_record['connections'], list):
-                        for connection in processed_record['connections']:
-                            rel_type = connection.get('type')
-                            target_label = connection.get('target_label')
-                            target_id = connection.get('target_id')
-
-                            if all([rel_type, target_label, target_id]):
-                                rel_query = f"MATCH (a:{label} {{id: $source_id}})
-                                              MATCH (b:{target_label} {{id: $target_id}})
-                                              MERGE (a)-[:{rel_type}]->(b)"
-                                tx.run(rel_query, source_id=record_identifier, target_id=target_id)
-                                self.successful_imports += 1 # Count relationship creation as a successful import operation
-                                logging.debug(f"Successfully created relationship {rel_type} from {record_identifier} to {target_id}")
-                            else:
-                                logging.warning(f"Malformed connection in record {record_identifier}: {connection}")
-                                self.failed_imports += 1
-                tx.commit()
+                successful, failed, timings, changes = self._write_batch(batch, domain_type, merge_on_conflict, session)
+            except (*RETRYABLE_ERRORS, CommitError) as e:
+                # A commit that failed on a dropped connection may still have been applied by the server, and
+                # writing the batch again would duplicate CREATEd nodes. Only MERGE batches are safe to repeat.
+                if isinstance(e, CommitError):
+                    retryable = merge_on_conflict and isinstance(e.__cause__, RETRYABLE_ERRORS)
+                else:
+                    retryable = True
+                if retryable and retries < self.max_retries:
+                    retries += 1
+                    logging.warning(f"Transient error writing batch from {file_path}, retrying "
+                                    f"({retries}/{self.max_retries}): {e}")
+                    continue
+                error = e
             except Exception as e:
-                if tx:
-                    tx.rollback()
-                self.failed_imports += len(batch) # Mark all records in batch as failed
-                logging.error(f"Transaction failed for batch. Rolling back. Error: {e}")
+                error = e
+            else:
+                self._record_result(file_path, successful=successful, failed=failed)
+                # Lets the API answer conditional requests with fresh ETags and notify change feed subscribers
+                self.data_versions.bump(changes["domains"])
+                self.change_journal.append(build_change_notice("merge" if merge_on_conflict else "create",
+                                                               changes["nodes"], changes["relationships"]))
+                if self.profiler:
+                    self.profiler.record_batch(file_path, len(batch), time.perf_counter() - started,
+                                               timings, retries, committed=True)
+                return
+
+            self._record_result(file_path, failed=len(batch))  # Mark all records in batch as failed
+            logging.error(f"Transaction failed for batch from {file_path}. Rolling back. Error: {error}")
+            if self.profiler:
+                self.profiler.record_batch(file_path, len(batch), time.perf_counter() - started,
+                                           {}, retries, committed=False)
+            return
+
+    def _write_batch(self, batch, domain_type, merge_on_conflict, session):
+        """Writes one batch in a single transaction, rolling back and re-raising on any error.
+
+        Returns the success and failure counts, phase timings, and the written nodes and relationships
+        together with the labels of every domain they touch.
+        """
+        # Records have already been mapped by the parse stage
+        successful = 0
+        failed = 0
+        timings = {"write_nodes": 0.0, "link_relationships": 0.0, "commit": 0.0}
+        labels = {domain_type}
+        nodes = []
+        relationships = []
+        tx = None
+        committing = False
+        try:
+            tx = session.begin_transaction()
+            for processed_record in batch:
+                if not isinstance(processed_record, dict):
+                    logging.warning(f"Skipping malformed record (not a dictionary): {processed_record}")
+                    failed += 1
+                    continue
+
+                record_identifier = processed_record.get('id') or processed_record.get('name') or processed_record.get('uuid')
+                if not record_identifier:
+                    logging.warning(f"Record missing common identifier (id, name, or uuid) after mapping: {processed_record}")
+
+                properties = {k: v for k, v in processed_record.items() if k not in ['domain', 'connections']}
+                label = domain_type
+
+                # Create/Merge Node
+                query_verb = "MERGE" if merge_on_conflict else "CREATE"
+                if merge_on_conflict and 'id' in properties:
+                    node_query = f"""{query_verb} (n:{label} {{id: $props.id}})
+                                   ON CREATE SET n = $props
+                                   ON MATCH SET n = $props"""
+                else:
+                    node_query = f"CREATE (n:{label} $props)"
+
+                started = time.perf_counter()
+                tx.run(node_query, props=properties)
+                timings["write_nodes"] += time.perf_counter() - started
+                successful += 1
+                nodes.append({"label": label, "id": record_identifier})
+                logging.debug(f"Successfully processed node for domain {domain_type}: {record_identifier or 'no-id'}")
+
+                # Process Relationships
+                if 'connections' in processed_record and isinstance(processed_record['connections'], list):
+                    for connection in processed_record['connections']:
+                        rel_type = connection.get('type')
+                        target_label = connection.get('target_label')
+                        target_id = connection.get('target_id')
+
+                        if all([rel_type, target_label, target_id]):
+                            rel_query = f"""MATCH (a:{label} {{id: $source_id}})
+                                          MATCH (b:{target_label} {{id: $target_id}})
+                                          MERGE (a)-[r:{rel_type}]->(b)
+                                          SET r += $rel_props"""
+                            started = time.perf_counter()
+                            tx.run(rel_query, source_id=record_identifier, target_id=target_id,
+                                   rel_props=connection.get('properties') or {})
+                            timings["link_relationships"] += time.perf_counter() - started
+                            labels.add(target_label)
+                            relationships.append({"type": rel_type, "source_label": label,
+                                                  "source_id": record_identifier,
+                                                  "target_label": target_label, "target_id": target_id})
+                            successful += 1  # Count relationship creation as a successful import operation
+                            logging.debug(f"Successfully created relationship {rel_type} from {record_identifier} to {target_id}")
+                        else:
+                            logging.warning(f"Malformed connection in record {record_identifier}: {connection}")
+                            failed += 1
+            started = time.perf_counter()
+            committing = True
+            tx.commit()
+            timings["commit"] = time.perf_counter() - started
+        except Exception as e:
+            # A failed commit already closes the transaction, and rolling it back again would raise
+            if tx and not committing:
+                tx.rollback()
+            if committing:
+                raise CommitError(f"Commit failed: {e}") from e
+            raise
+        changes = {"domains": sorted(labels), "nodes": nodes, "relationships": relationships}
+        return successful, failed, timings, changes
+
 
 def main():
     parser = argparse.ArgumentParser(description="Import JSON data into Neo4j.")
-    parser.add_argument("file", help="Path to the JSON data file.")
+    parser.add_argument("paths", nargs="+",
+                        help="JSON data files, directories of JSON files, or glob patterns (e.g., 'dumps/*.json').")
     parser.add_argument("--domain", required=True, help="Domain type for the data (e.g., WEATHER, HEALTH).")
     parser.add_argument("--uri", default=os.getenv("NEO4J_URI"),
                         help="Neo4j URI (default: NEO4J_URI from .env).")
@@ -167,6 +575,20 @@ def main():
     parser.add_argument("--batch-size", type=int, default=1000,
                         help="Number of records to process in each batch (default: 1000).")
     parser.add_argument("--mapping-file", help="Path to a JSON file defining custom mappings and schema normalization rules.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of processes used to parse and map files (default: number of CPU cores).")
+    parser.add_argument("--writers", type=int, default=1,
+                        help="Number of concurrent Neo4j writer sessions (default: 1). With more than one, batches "
+                             "commit in parallel and connections to nodes in other batches may not be linked.")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Maximum number of parsed batches waiting for a writer (default: 8).")
+    parser.add_argument("--max-retries", type=int, default=2,
+                        help="Times a batch is retried after a transient Neo4j error (default: 2). "
+                             "Without --merge, batches that fail during commit are never retried.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time each phase and batch, show a live progress line, and write a JSON report.")
+    parser.add_argument("--profile-report", default="import_report.json", metavar="REPORT_FILE",
+                        help="File the --profile report is written to (default: import_report.json).")
 
     args = parser.parse_args()
 
@@ -175,9 +597,19 @@ def main():
         logging.error("Neo4j URI, user, and password must be provided via arguments or .env file.")
         exit(1)
 
+    file_paths = resolve_input_paths(args.paths)
+    if not file_paths:
+        logging.error("No input files found for the given paths.")
+        exit(1)
+    if args.profile and os.path.abspath(args.profile_report) in {os.path.abspath(p) for p in file_paths}:
+        logging.error(f"Profiling report file {args.profile_report} is also an input file.")
+        exit(1)
+
+    profiler = ImportProfiler() if args.profile else None
     importer = None
     try:
-        importer = Neo4jImporter(args.uri, args.user, args.password)
+        importer = Neo4jImporter(args.uri, args.user, args.password,
+                                 max_retries=args.max_retries, profiler=profiler)
 
         if args.mapping_file:
             try:
@@ -188,11 +620,32 @@ def main():
                 logging.error(f"Error loading mapping file {args.mapping_file}: {e}")
                 exit(1)
 
-        importer.import_data(args.file, args.domain, args.merge, args.batch_size)
+        if profiler:
+            profiler.start(importer, len(file_paths))
+        try:
+            importer.import_files(file_paths, args.domain, args.merge, args.batch_size,
+                                  workers=args.workers, writers=args.writers, queue_size=args.queue_size)
+        finally:
+            if profiler:
+                profiler.stop()
         logging.info("\n--- Import Summary ---")
+        for file_path, stats in importer.file_stats.items():
+            logging.info(f"{file_path}: {stats['successful']} successful, {stats['failed']} failed")
+        logging.info(f"Files processed: {len(importer.file_stats)}")
         logging.info(f"Successful imports: {importer.successful_imports}")
         logging.info(f"Failed imports: {importer.failed_imports}")
         logging.info("----------------------")
+        if profiler:
+            settings = {
+                "domain": args.domain,
+                "merge": args.merge,
+                "batch_size": args.batch_size,
+                "workers": args.workers or os.cpu_count(),
+                "writers": args.writers,
+                "queue_size": args.queue_size,
+                "max_retries": args.max_retries,
+            }
+            profiler.write_report(args.profile_report, importer, settings)
     except (AuthError, ServiceUnavailable):
         exit(1)
     except Exception as e:
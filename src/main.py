@@ -1,13 +1,17 @@
 from fastapi import FastAPI, HTTPException, Request, status, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.exception_handlers import http_exception_handler as default_http_exception_handler
 from datetime import datetime
 from typing import Dict, Any
 import os
+import atexit
 import logging
+import logging.handlers
+import queue
 import time
-from collections import defaultdict
 import re # Import re module
 
+from src.metrics import metrics, TELEMETRY_ENABLED, API_WORKERS
 from src.routers import v1
 
 # --- Configuration from Environment Variables ---
@@ -17,30 +21,55 @@ CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "*").split(",")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true"
 RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
-TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "false").lower() == "true" # New telemetry flag
-
-# --- Global Error Counter ---
-fatal_error_count = 0
 
 # --- Logging Setup ---
-logging.basicConfig(level=getattr(logging, LOG_LEVEL), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
 class SensitiveDataFilter(logging.Filter):
-    def filter(self, record):
-        # Redact sensitive environment variables
-        if hasattr(record, 'msg') and isinstance(record.msg, str):
-            record.msg = record.msg.replace(os.getenv("NEO4J_PASSWORD", "password"), "********")
-            record.msg = record.msg.replace(os.getenv("TUNNEL_TOKEN", "your_cloudflare_tunnel_token_here"), "********")
-        
-        # Attempt to redact IP addresses from the message itself if present
-        if hasattr(record, 'msg') and isinstance(record.msg, str):
-            # Simple regex to find common IPv4 patterns
-            record.msg = re.sub(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', '[REDACTED_IP]', record.msg)
+    # Simple regex to find common IPv4 patterns
+    IPV4_PATTERN = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+
+    def __init__(self):
+        super().__init__()
+        # Secrets are read once; the environment doesn't change while the app is running
+        secrets = [os.getenv("NEO4J_PASSWORD", "password"), os.getenv("TUNNEL_TOKEN", "your_cloudflare_tunnel_token_here")]
+        self.secret_pattern = re.compile("|".join(re.escape(secret) for secret in secrets if secret))
 
+    def filter(self, record):
+        if isinstance(record.msg, str):
+            # Redact sensitive environment variables
+            record.msg = self.secret_pattern.sub("********", record.msg)
+            # Attempt to redact IP addresses from the message itself if present
+            record.msg = self.IPV4_PATTERN.sub('[REDACTED_IP]', record.msg)
         return True
 
-logger.addFilter(SensitiveDataFilter())
+# Log records are handed to a background thread through a queue so request handlers never block on
+# console I/O. QueueHandler formats the message before queueing it, so redaction runs on the listener
+# thread, off the request path, and covers every logger, including uvicorn's (see route_server_loggers).
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+log_handler.addFilter(SensitiveDataFilter())
+log_listener = logging.handlers.QueueListener(queue.SimpleQueue(), log_handler, respect_handler_level=True)
+queue_handler = logging.handlers.QueueHandler(log_listener.queue)
+# Only interpolate the message here; the output handler applies the full format on the listener thread
+queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=getattr(logging, LOG_LEVEL), handlers=[queue_handler], force=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+logger = logging.getLogger(__name__)
+
+
+def route_server_loggers():
+    """Sends uvicorn's own loggers through the queue as well.
+
+    uvicorn configures its loggers before importing the app, with their own stream handlers and
+    ``propagate=False``, so without this the access log would still write synchronously to stdout
+    and client IPs would skip the redaction filter.
+    """
+    # uvicorn.error has no handlers of its own and propagates to uvicorn
+    for name in ("uvicorn", "uvicorn.access"):
+        logging.getLogger(name).handlers = [queue_handler]
+
+
+route_server_loggers()
 
 app = FastAPI(
     title="OpenBayanMesh-Edge API",
@@ -61,28 +90,34 @@ if CORS_ENABLED:
 else:
     logger.info("CORS is disabled.")
 
+if API_WORKERS > 1:
+    logger.info(f"Multi-worker mode: {API_WORKERS} workers sharing metrics through {metrics.path}.")
+
+# --- Request Metrics ---
+if TELEMETRY_ENABLED:
+    @app.middleware("http")
+    async def count_requests(request: Request, call_next):
+        response = await call_next(request)
+        metrics.increment("requests_total", f"responses_{response.status_code // 100}xx")
+        return response
+
 # --- Rate Limiting (Placeholder) ---
 # In a production environment, consider using a dedicated rate limiting library
 # like `fastapi-limiter` or a reverse proxy (e.g., Nginx, Cloudflare).
-# This is a very basic in-memory implementation and not suitable for production.
+# This is a very basic fixed-window implementation. Counts are kept in the metrics store, so they are
+# shared by all workers in multi-worker mode.
 if RATE_LIMIT_ENABLED:
-    request_counts = defaultdict(lambda: defaultdict(int))
-    last_reset_time = defaultdict(float)
-
-    async def rate_limiter(request: Request):
+    # A plain function, so FastAPI runs it in the threadpool and a busy shared store can't block the event loop
+    def rate_limiter(request: Request):
         client_ip = request.client.host
-        current_time = time.time()
-
-        if current_time - last_reset_time[client_ip] > 60:
-            request_counts[client_ip]["count"] = 0
-            last_reset_time[client_ip] = current_time
-
-        request_counts[client_ip]["count"] += 1
+        current_window = int(time.time() // 60)
 
-        if request_counts[client_ip]["count"] > RATE_LIMIT_PER_MINUTE:
+        if metrics.rate_limit_hit(client_ip, current_window) > RATE_LIMIT_PER_MINUTE:
+            metrics.increment("rate_limited_requests")
             raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Rate limit exceeded")
 
-    app.dependency_overrides[Depends(rate_limiter)] = rate_limiter
+    # Router-level dependencies apply to every route registered after this point, including the v1 router
+    app.router.dependencies.append(Depends(rate_limiter))
     logger.info(f"Rate limiting enabled: {RATE_LIMIT_PER_MINUTE} requests per minute.")
 else:
     logger.info("Rate limiting is disabled.")
@@ -117,9 +152,11 @@ async def health_v2_deprecated(response: Response):
 # Error handling for non-existent or deprecated API versions
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    global fatal_error_count
-    if exc.status_code >= 500:
-        fatal_error_count += 1
+    # 503s from admission control and 504s from query timeouts are expected under load and already logged as
+    # warnings, so they must not flood the log with tracebacks or count as fatal errors
+    if exc.status_code >= 500 and exc.status_code not in (status.HTTP_503_SERVICE_UNAVAILABLE,
+                                                          status.HTTP_504_GATEWAY_TIMEOUT):
+        metrics.increment("fatal_errors")
         logger.error(f"Fatal error: {exc.detail} at {request.url}", exc_info=True)
 
     if exc.status_code == status.HTTP_404_NOT_FOUND:
@@ -132,10 +169,11 @@ async def http_exception_handler(request: Request, exc: HTTPException):
                 # If a different v2 endpoint is requested and not found, it will fall through to generic 404
                 pass
             elif version_requested == "v3": # Example of a non-existent version
-                return HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                                     detail=f"API Version {version_requested} not found. See /versions for available API versions.",
-                                     headers={"Link": "</versions>; rel=\"versions\""})
-    return exc
+                exc = HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                    detail=f"API Version {version_requested} not found. See /versions for available API versions.",
+                                    headers={"Link": "</versions>; rel=\"versions\""})
+    # Exception handlers must return a response, not the exception
+    return await default_http_exception_handler(request, exc)
 
 # Generic catch-all for unmatched routes (after all other routes are checked)
 @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
@@ -0,0 +1,145 @@
+import os
+import atexit
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "false").lower() == "true"  # New telemetry flag
+# uvicorn reads WEB_CONCURRENCY as the default for --workers, so the same variable selects the metrics backend
+API_WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+# /dev/shm keeps the shared store in memory on Linux; elsewhere it falls back to a temp file
+METRICS_DB_FILE = os.getenv("METRICS_DB_FILE", os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "openbayanmesh_metrics.db"))
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+
+class InProcessMetrics:
+    """Counters and rate limit windows for a single API worker."""
+
+    backend = "local"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._rate_windows = {}
+
+    def increment(self, *names):
+        with self._lock:
+            for name in names:
+                self._counters[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def rate_limit_hit(self, client, window):
+        """Counts a request from ``client`` in the fixed ``window`` and returns the count so far."""
+        with self._lock:
+            current_window, count = self._rate_windows.get(client, (window, 0))
+            count = count + 1 if current_window == window else 1
+            self._rate_windows[client] = (window, count)
+            return count
+
+
+class SharedMetrics:
+    """Counters and rate limit windows shared by every API worker through a SQLite file.
+
+    Used when the API runs with several uvicorn workers, which are separate processes. The
+    database lives in shared memory where available and skips fsync, because losing counters on
+    a crash is acceptable. Each thread gets its own connection because SQLite connections can't
+    be shared between threads.
+
+    Counter increments are buffered in the worker and written by a background thread every
+    ``flush_interval`` seconds, so request handlers never wait on the database for them.
+    """
+
+    backend = "shared"
+    CLEANUP_EVERY = 256
+
+    def __init__(self, path=None, flush_interval=None):
+        self.path = path or METRICS_DB_FILE
+        self.flush_interval = flush_interval or METRICS_FLUSH_INTERVAL
+        self._local = threading.local()
+        self._calls = 0
+        self._pending = defaultdict(int)
+        self._pending_lock = threading.Lock()
+        self._flusher = None
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limits "
+                         "(client TEXT, window INTEGER, count INTEGER NOT NULL, PRIMARY KEY (client, window))")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def increment(self, *names):
+        with self._pending_lock:
+            for name in names:
+                self._pending[name] += 1
+            if self._flusher is None:
+                # Started on first use rather than at import, so no thread exists before uvicorn starts the worker
+                self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def flush(self):
+        """Adds this worker's buffered counter increments to the shared store."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        if not pending:
+            return
+        try:
+            with self._connection() as conn:
+                conn.executemany("INSERT INTO counters (name, value) VALUES (?, ?) "
+                                 "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", pending.items())
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update shared metrics in {self.path}: {e}")
+            # Keep the increments for the next flush
+            with self._pending_lock:
+                for name, value in pending.items():
+                    self._pending[name] += value
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def snapshot(self):
+        self.flush()
+        try:
+            return dict(self._connection().execute("SELECT name, value FROM counters").fetchall())
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read shared metrics from {self.path}: {e}")
+            return {}
+
+    def rate_limit_hit(self, client, window):
+        """Counts a request from ``client`` in the fixed ``window`` and returns the count across all workers."""
+        self._calls += 1
+        try:
+            with self._connection() as conn:
+                conn.execute("INSERT INTO rate_limits (client, window, count) VALUES (?, ?, 1) "
+                             "ON CONFLICT(client, window) DO UPDATE SET count = count + 1", (client, window))
+                # The write lock taken by the insert is held until commit, so this read sees our own update
+                count = conn.execute("SELECT count FROM rate_limits WHERE client = ? AND window = ?",
+                                     (client, window)).fetchone()[0]
+                if self._calls % self.CLEANUP_EVERY == 0:
+                    conn.execute("DELETE FROM rate_limits WHERE window < ?", (window,))
+            return count
+        except sqlite3.Error as e:
+            # Fail open: a broken metrics store must not take the API down
+            logger.warning(f"Could not update shared rate limits in {self.path}: {e}")
+            return 0
+
+
+metrics = SharedMetrics() if API_WORKERS > 1 else InProcessMetrics()
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+QUERY_MAX_CONCURRENCY_PER_DOMAIN = int(os.getenv("QUERY_MAX_CONCURRENCY_PER_DOMAIN", "4"))
+QUERY_MAX_QUEUE_PER_DOMAIN = int(os.getenv("QUERY_MAX_QUEUE_PER_DOMAIN", "8"))
+QUERY_QUEUE_TIMEOUT = float(os.getenv("QUERY_QUEUE_TIMEOUT", "2"))
+QUERY_RETRY_AFTER = int(os.getenv("QUERY_RETRY_AFTER", "1"))
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls so they share one in-flight execution.
+
+    The first caller for a key starts the work as its own task; callers that arrive while it is
+    running await the same task. Results are not cached: once the task finishes the key is
+    released and the next call runs again.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+
+    async def do(self, key, work):
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            logger.debug(f"Coalescing query with an in-flight execution: {key[0]}")
+        # Shield the shared task so one disconnecting caller can't cancel it for everyone else
+        return await asyncio.shield(task)
+
+
+class DomainAdmission:
+    """Per-domain concurrency limit with a short, bounded wait queue.
+
+    Requests beyond ``max_concurrency`` wait for a slot. If ``max_queue`` requests are already
+    waiting, or no slot frees up within ``queue_timeout`` seconds, the request is rejected with
+    ``503 Service Unavailable`` and a ``Retry-After`` header.
+    """
+
+    def __init__(self, max_concurrency=None, max_queue=None, queue_timeout=None, retry_after=None):
+        self.max_concurrency = max_concurrency or QUERY_MAX_CONCURRENCY_PER_DOMAIN
+        self.max_queue = QUERY_MAX_QUEUE_PER_DOMAIN if max_queue is None else max_queue
+        self.queue_timeout = QUERY_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.retry_after = retry_after or QUERY_RETRY_AFTER
+        self._semaphores = {}
+        self._waiting = defaultdict(int)
+
+    def _overloaded(self, domain):
+        logger.warning(f"Rejecting query for domain '{domain}': concurrency limit and wait queue are full.")
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Too many concurrent queries for domain '{domain}'. Please retry shortly.",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    @asynccontextmanager
+    async def slot(self, domain):
+        semaphore = self._semaphores.setdefault(domain, asyncio.Semaphore(self.max_concurrency))
+        if semaphore.locked():
+            if self._waiting[domain] >= self.max_queue:
+                raise self._overloaded(domain)
+            self._waiting[domain] += 1
+            try:
+                await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._overloaded(domain)
+            finally:
+                self._waiting[domain] -= 1
+        else:
+            await semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+
+single_flight = SingleFlight()
+domain_admission = DomainAdmission()
+
+
+async def run_domain_query(domain, query, params, fetch):
+    """Runs ``fetch(query, params)`` in a worker thread, coalesced and admitted per domain.
+
+    ``fetch`` is a blocking function that executes the query and returns its materialized result.
+    """
+    async def admitted():
+        async with domain_admission.slot(domain):
+            return await asyncio.to_thread(fetch, query, params)
+
+    key = (query, tuple(sorted(params.items())))
+    return await single_flight.do(key, admitted)
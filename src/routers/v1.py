@@ -1,13 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response, Header
+from fastapi.responses import StreamingResponse
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from neo4j import GraphDatabase
+from typing import List, Dict, Any, Optional, Literal, Union, Tuple
+from neo4j import GraphDatabase, Query as Neo4jQuery
 import os
+import re
+import json
+import asyncio
+import logging
+import threading
 
 from src.dependencies import get_api_version
-from src.main import fatal_error_count, TELEMETRY_ENABLED # Import the global error counter and TELEMETRY_ENABLED
+from src.metrics import metrics, TELEMETRY_ENABLED, API_WORKERS # Shared across workers in multi-worker mode
 from src.domain_manager import domain_manager # Import the domain manager
+from src.data_version import data_versions
+from src.change_feed import change_feed
+from src.query_control import run_domain_query
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(dependencies=[Depends(get_api_version)])
 
@@ -16,20 +28,31 @@ NEO4J_URI = os.getenv("NEO4J_URI", "bolt://neo4j:7687")
 NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
 NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+NEO4J_QUERY_TIMEOUT = float(os.getenv("NEO4J_QUERY_TIMEOUT", "10"))
+
+CHANGE_FEED_POLL_INTERVAL = float(os.getenv("CHANGE_FEED_POLL_INTERVAL", "0.5"))
+CHANGE_FEED_HEARTBEAT_INTERVAL = float(os.getenv("CHANGE_FEED_HEARTBEAT_INTERVAL", "15"))
 
 driver = None
+driver_lock = threading.Lock()
 
 def get_neo4j_driver():
     global driver
-    if driver is None:
+    if driver is not None:
+        return driver
+    # Queries run in worker threads, so make sure only one of them creates the driver
+    with driver_lock:
+        if driver is not None:
+            return driver
         try:
             driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
             driver.verify_connectivity()
             print("Neo4j driver created and verified.")
         except Exception as e:
             print(f"Failed to create Neo4j driver: {e}")
+            driver = None
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not connect to Neo4j")
-    return driver
+        return driver
 
 # Pydantic Models
 class HealthResponse(BaseModel):
@@ -39,7 +62,7 @@ class HealthResponse(BaseModel):
 
 class DomainSchema(BaseModel):
     properties: Dict[str, str]
-    relationships: List[Dict[str, str]]
+    relationships: List[Dict[str, Any]]
     deprecated: Optional[bool] = False
     sunset_date: Optional[str] = None
 
@@ -60,11 +83,188 @@ class Neo4jRelationship(BaseModel):
     end_node_id: int
     properties: Dict[str, Any]
 
+class RelationshipCountResponse(BaseModel):
+    count: int
+
 class MetricsResponse(BaseModel):
     message: str
     metrics: Dict[str, Any]
     fatal_errors: int
 
+IDENTIFIER_PATTERN = re.compile(r"^[a-zA-Z0-9_]+$")
+
+RELATIONSHIP_PATTERNS = {
+    "out": "(a:{domain})-[r{rel_type}]->(b{target_label})",
+    "in": "(a:{domain})<-[r{rel_type}]-(b{target_label})",
+    "both": "(a:{domain})-[r{rel_type}]-(b{target_label})",
+}
+
+def validate_identifier(value: str, kind: str) -> str:
+    # Labels, relationship types and property keys can't be parameterized in Cypher, so they must be checked
+    if not IDENTIFIER_PATTERN.match(value):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {kind}: {value}")
+    return value
+
+def coerce_filter_value(key: str, value: str, expected_type: str) -> Any:
+    try:
+        if expected_type == "int":
+            return int(value)
+        elif expected_type == "float":
+            return float(value)
+        elif expected_type == "bool":
+            return value.lower() in ['true', '1', 't', 'y']
+        # Add more type conversions as needed
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid type for property '{key}'. Expected {expected_type}.")
+    return value
+
+def relationship_property_types(schemas: Dict[str, Dict[str, Any]], domain: str, direction: str,
+                                rel_type: Optional[str], other_label: Optional[str]) -> Dict[str, str]:
+    """Collects property types for the relationships a query can match from the domain schemas.
+
+    Outgoing relationships are described by the domain's own ``relationships`` entries. Incoming ones
+    are described by other domains' entries whose ``target_label`` is this domain, and ``other_label``
+    then names their source domain.
+    """
+    property_types: Dict[str, str] = {}
+    for source_label, schema in schemas.items():
+        for relationship in (schema or {}).get("relationships", []):
+            if rel_type and relationship.get("type") != rel_type:
+                continue
+            outgoing = (direction in ("out", "both") and source_label == domain
+                        and other_label in (None, relationship.get("target_label")))
+            incoming = (direction in ("in", "both") and relationship.get("target_label") == domain
+                        and other_label in (None, source_label))
+            if outgoing or incoming:
+                property_types.update(relationship.get("properties", {}))
+    return property_types
+
+def build_relationship_query(domain: str, direction: str, rel_type: Optional[str], target_label: Optional[str],
+                             filters: Dict[str, Any], count_only: bool) -> (str, Dict[str, Any]):
+    # Labels go in the pattern rather than WHERE so the planner can start from a label scan
+    pattern = RELATIONSHIP_PATTERNS[direction].format(
+        domain=domain,
+        rel_type=f":{rel_type}" if rel_type else "",
+        target_label=f":{target_label}" if target_label else "",
+    )
+    where_clauses = []
+    params = {}
+    for key, value in filters.items():
+        where_clauses.append(f"r.{key} = $rel_{key}")
+        params[f"rel_{key}"] = value
+
+    query = f"MATCH {pattern}"
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    # An undirected pattern matches a relationship between two nodes of the domain once from each end
+    if count_only:
+        query += " RETURN count(DISTINCT r) AS count" if direction == "both" else " RETURN count(r) AS count"
+    else:
+        query += " RETURN DISTINCT r" if direction == "both" else " RETURN r"
+    return query, params
+
+def not_modified_response(request: Request, response: Response, version: Tuple[str, datetime]) -> Optional[Response]:
+    """Sets ETag and Last-Modified from a data version and returns a 304 response if the client's copy is current.
+
+    Called before querying Neo4j, so polling clients with an up-to-date copy never reach the database.
+    """
+    token, last_modified = version
+    headers = {
+        "ETag": f'W/"{token}"',
+        "Last-Modified": format_datetime(last_modified.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since and uses weak comparison
+        client_tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in client_tags or f'"{token}"' in client_tags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.replace(microsecond=0) <= since:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+async def stream_domain_changes(request: Request, domain: str, since: Optional[int]):
+    """Yields Server-Sent Events for a domain, starting after ``since`` or from now if it is None."""
+    change_feed.refresh()
+    last_seq = change_feed.latest_seq() if since is None else since
+    idle = 0.0
+    while True:
+        entries, gap = change_feed.entries_since(last_seq, domain)
+        latest = change_feed.latest_seq()
+        if gap:
+            # Changes after last_seq were evicted from the ring buffer, so the client must re-query. Buffered entries
+            # are not replayed after the reset: they have lower ids and would move the client's Last-Event-ID back.
+            yield format_sse("reset", {"domain": domain, "oldest_seq": change_feed.oldest_seq(), "latest_seq": latest}, latest)
+        else:
+            for entry in entries:
+                yield format_sse("change", entry, entry["seq"])
+        if entries or gap:
+            idle = 0.0
+        # Entries for other domains are skipped too, so a later gap check starts from the newest seq
+        last_seq = latest if gap else max(last_seq, latest)
+
+        if await request.is_disconnected():
+            break
+        await asyncio.sleep(CHANGE_FEED_POLL_INTERVAL)
+        idle += CHANGE_FEED_POLL_INTERVAL
+        if idle >= CHANGE_FEED_HEARTBEAT_INTERVAL:
+            # Comment lines keep idle connections open through proxies and the tunnel
+            yield ": keep-alive\n\n"
+            idle = 0.0
+        change_feed.refresh()
+
+# Blocking query functions, run in worker threads by run_domain_query
+def fetch_nodes(query: str, params: Dict[str, Any]) -> List[Neo4jNode]:
+    with get_neo4j_driver().session(database=NEO4J_DATABASE) as session:
+        result = session.run(Neo4jQuery(query, timeout=NEO4J_QUERY_TIMEOUT), params)
+        return [Neo4jNode(id=node.id, labels=list(node.labels), properties=dict(node.items()))
+                for node in (record["n"] for record in result)]
+
+def fetch_relationships(query: str, params: Dict[str, Any]) -> List[Neo4jRelationship]:
+    with get_neo4j_driver().session(database=NEO4J_DATABASE) as session:
+        result = session.run(Neo4jQuery(query, timeout=NEO4J_QUERY_TIMEOUT), params)
+        return [Neo4jRelationship(id=rel.id, type=rel.type, start_node_id=rel.start_node.id,
+                                  end_node_id=rel.end_node.id, properties=dict(rel.items()))
+                for rel in (record["r"] for record in result)]
+
+def fetch_count(query: str, params: Dict[str, Any]) -> RelationshipCountResponse:
+    with get_neo4j_driver().session(database=NEO4J_DATABASE) as session:
+        record = session.run(Neo4jQuery(query, timeout=NEO4J_QUERY_TIMEOUT), params).single()
+        return RelationshipCountResponse(count=record["count"] if record else 0)
+
+async def execute_domain_query(domain: str, query: str, params: Dict[str, Any], fetch) -> Any:
+    try:
+        return await run_domain_query(domain, query, params, fetch)
+    except HTTPException:
+        raise
+    except Exception as e:
+        if "TransactionTimedOut" in (getattr(e, "code", None) or ""):
+            logger.warning(f"Query for domain '{domain}' exceeded the {NEO4J_QUERY_TIMEOUT}s timeout.")
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                                detail=f"Neo4j query exceeded the {NEO4J_QUERY_TIMEOUT}s timeout.")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Neo4j query failed: {e}")
+
 # Helper function for dynamic Cypher query construction
 def build_cypher_query(domain: str, filters: Dict[str, Any]) -> (str, Dict[str, Any]):
     match_clause = f"MATCH (n:{domain})"
@@ -73,8 +273,7 @@ def build_cypher_query(domain: str, filters: Dict[str, Any]) -> (str, Dict[str,
 
     for key, value in filters.items():
         # Basic sanitization to prevent injection, though parameterized queries are the main defense
-        if not re.match(r"^[a-zA-Z0-9_]+$", key): # Ensure key is alphanumeric
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid filter key: {key}")
+        validate_identifier(key, "filter key")
         where_clauses.append(f"n.{key} = ${key}")
         params[key] = value
 
@@ -90,9 +289,19 @@ async def health_v1():
     return {"status": "healthy", "timestamp": datetime.now(), "version": "v1"}
 
 @router.get("/info", response_model=InfoResponse, tags=["v1 - System Status"])
-async def info_v1():
+async def info_v1(request: Request, response: Response):
+    not_modified = not_modified_response(request, response, data_versions.global_version())
+    if not_modified:
+        return not_modified
     return {"app_name": "OpenBayanMesh-Edge", "api_version": "v1", "supported_domains": domain_manager.get_all_domains()}
 
+@router.get("/query/{domain}", tags=["v1 - Data Operations"], response_model=List[Neo4jNode])
+async def query_domain(
+    request: Request,
+    response: Response,
+    domain: str,
+    properties: Optional[str] = Query(None, description="Comma-separated list of node properties to filter by (e.g., 'city=Manila')")
+):
     if domain.upper() not in domain_manager.get_all_domains():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Domain '{domain}' not supported. Available domains: {list(domain_manager.get_all_domains().keys())}")
 
@@ -119,46 +328,28 @@ async def info_v1():
                     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported property '{key}' for domain '{domain}'. Available properties: {list(domain_schema["properties"].keys())}")
 
                 # Basic type validation (can be expanded)
-                expected_type = domain_schema["properties"][key]
-                try:
-                    if expected_type == "int":
-                        value = int(value)
-                    elif expected_type == "float":
-                        value = float(value)
-                    elif expected_type == "bool":
-                        value = value.lower() in ['true', '1', 't', 'y']
-                    # Add more type conversions as needed
-                except ValueError:
-                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid type for property '{key}'. Expected {expected_type}.")
-
-                filters[key] = value
+                filters[key] = coerce_filter_value(key, value, domain_schema["properties"][key])
             else:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid property filter format: {prop_filter}. Expected 'key=value'.")
 
-    cypher_query, params = build_cypher_query(domain.upper(), filters)
-    driver = get_neo4j_driver()
-    nodes = []
-    try:
-        with driver.session(database=NEO4J_DATABASE) as session:
-            result = session.run(cypher_query, params)
-            for record in result:
-                node = record["n"]
-                nodes.append(Neo4jNode(
-                    id=node.id,
-                    labels=list(node.labels),
-                    properties=dict(node.items())
-                ))
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Neo4j query failed: {e}")
+    not_modified = not_modified_response(request, response, data_versions.domain_version(domain))
+    if not_modified:
+        return not_modified
 
-    return nodes
+    cypher_query, params = build_cypher_query(domain.upper(), filters)
+    return await execute_domain_query(domain.upper(), cypher_query, params, fetch_nodes)
 
-@router.get("/query/{domain}/relationships", tags=["v1 - Data Operations"], response_model=List[Neo4jRelationship])
+@router.get("/query/{domain}/relationships", tags=["v1 - Data Operations"],
+            response_model=Union[List[Neo4jRelationship], RelationshipCountResponse])
 async def query_domain_relationships(
+    request: Request,
+    response: Response,
     domain: str,
     rel_type: Optional[str] = Query(None, description="Type of relationship to filter by"),
     target_label: Optional[str] = Query(None, description="Label of the target node in the relationship"),
-    properties: Optional[str] = Query(None, description="Comma-separated list of relationship properties to filter by (e.g., 'since=2023')")
+    properties: Optional[str] = Query(None, description="Comma-separated list of relationship properties to filter by (e.g., 'since=2023')"),
+    direction: Literal["out", "in", "both"] = Query("both", description="Relationship direction relative to the domain node"),
+    count_only: bool = Query(False, description="Return only the number of matching relationships")
 ):
     if domain.upper() not in domain_manager.get_all_domains():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Domain '{domain}' not supported. Available domains: {list(domain_manager.get_all_domains().keys())}")
@@ -170,50 +361,53 @@ async def query_domain_relationships(
             detail_msg += f" It will be removed after {domain_info["sunset_date"]}."
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail_msg)
 
-    match_clause = f"MATCH (a:{domain.upper()})-[r]-(b)"
-    where_clauses = []
-    params = {}
-
     if rel_type:
-        match_clause = f"MATCH (a:{domain.upper()})-[r:{rel_type}]-(b)"
-
+        validate_identifier(rel_type, "relationship type")
     if target_label:
-        where_clauses.append(f"b:{target_label}")
+        validate_identifier(target_label, "target label")
 
+    filters = {}
     if properties:
-        # This part needs to be more sophisticated to handle relationship properties vs node properties
-        # For simplicity, assuming relationship properties for now
+        property_types = relationship_property_types(domain_manager.get_all_domains(), domain.upper(), direction,
+                                                     rel_type, target_label)
         for prop_filter in properties.split(','):
             if '=' in prop_filter:
                 key, value = prop_filter.split('=', 1)
-                where_clauses.append(f"r.{key.strip()} = ${key.strip()}")
-                params[key.strip()] = value.strip()
+                key = validate_identifier(key.strip(), "filter key")
+                # Properties missing from the schema are compared as strings
+                filters[key] = coerce_filter_value(key, value.strip(), property_types.get(key, "str"))
             else:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid property filter format: {prop_filter}. Expected 'key=value'.")
 
-    query = match_clause
-    if where_clauses:
-        query += " WHERE " + " AND ".join(where_clauses)
-    query += " RETURN r"
+    not_modified = not_modified_response(request, response, data_versions.domain_version(domain))
+    if not_modified:
+        return not_modified
 
-    driver = get_neo4j_driver()
-    relationships = []
-    try:
-        with driver.session(database=NEO4J_DATABASE) as session:
-            result = session.run(query, params)
-            for record in result:
-                rel = record["r"]
-                relationships.append(Neo4jRelationship(
-                    id=rel.id,
-                    type=rel.type,
-                    start_node_id=rel.start_node.id,
-                    end_node_id=rel.end_node.id,
-                    properties=dict(rel.items())
-                ))
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Neo4j query failed: {e}")
+    query, params = build_relationship_query(domain.upper(), direction, rel_type, target_label, filters, count_only)
+
+    return await execute_domain_query(domain.upper(), query, params, fetch_count if count_only else fetch_relationships)
+
+@router.get("/changes/{domain}", tags=["v1 - Data Operations"])
+async def domain_changes(
+    request: Request,
+    domain: str,
+    since: Optional[int] = Query(None, description="Resume after this sequence id instead of streaming only new changes"),
+    last_event_id: Optional[str] = Header(None, description="Sent by EventSource clients when reconnecting")
+):
+    if domain.upper() not in domain_manager.get_all_domains():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Domain '{domain}' not supported. Available domains: {list(domain_manager.get_all_domains().keys())}")
+
+    if since is None and last_event_id:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid Last-Event-ID: {last_event_id}")
 
-    return relationships
+    return StreamingResponse(
+        stream_domain_changes(request, domain.upper(), since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.post("/admin/refresh-schemas", tags=["Admin"]) # This endpoint should be protected in a real application
 async def refresh_schemas():
@@ -229,8 +423,12 @@ async def deprecate_domain_endpoint(domain_name: str, sunset_date: Optional[str]
 async def metrics_v1():
     if not TELEMETRY_ENABLED:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Telemetry is disabled. Enable TELEMETRY_ENABLED in environment variables to access metrics.")
-    # Placeholder for metrics collection
-    return {"message": "Metrics endpoint for v1", "metrics": {}, "fatal_errors": fatal_error_count}
+    counters = metrics.snapshot()
+    return {
+        "message": "Metrics endpoint for v1",
+        "metrics": {"workers": API_WORKERS, "backend": metrics.backend, "counters": counters},
+        "fatal_errors": counters.get("fatal_errors", 0),
+    }
 
 @router.get("/node/{node_id}", response_model=Neo4jNode, tags=["v1 - Data Operations"])
 async def get_node_by_id(node_id: int):
@@ -0,0 +1,84 @@
+import asyncio
+from src.change_feed import ChangeJournal, ChangeFeed, build_change_notice
+
+def _entry(domain, node_id, target_label=None):
+    relationships = []
+    if target_label:
+        relationships.append({"type": "LOCATED_IN", "source_label": domain, "source_id": node_id,
+                              "target_label": target_label, "target_id": "city-1"})
+    return build_change_notice("create", [{"label": domain, "id": node_id}], relationships)
+
+def test_journal_assigns_increasing_sequence_ids(tmp_path):
+    journal = ChangeJournal(str(tmp_path / "changes.jsonl"))
+    assert journal.append(_entry("WEATHER", "w-1")) == 1
+    assert journal.append(_entry("WEATHER", "w-2")) == 2
+
+def test_feed_filters_entries_by_domain(tmp_path):
+    path = str(tmp_path / "changes.jsonl")
+    journal = ChangeJournal(path)
+    journal.append(_entry("WEATHER", "w-1", target_label="CITY"))
+    journal.append(_entry("HEALTH", "h-1"))
+
+    feed = ChangeFeed(path)
+    feed.refresh()
+    entries, gap = feed.entries_since(0, "city")
+    assert not gap
+    assert [e["seq"] for e in entries] == [1]
+    assert entries[0]["nodes"] == 0
+    assert entries[0]["relationships"] == 1
+    assert entries[0]["ids"] == ["city-1"]
+
+def test_feed_picks_up_new_entries_and_rotation(tmp_path):
+    path = str(tmp_path / "changes.jsonl")
+    journal = ChangeJournal(path, max_bytes=1)
+    feed = ChangeFeed(path)
+    journal.append(_entry("WEATHER", "w-1"))
+    feed.refresh()
+
+    # Both appends rotate the file because it is already larger than max_bytes
+    journal.append(_entry("WEATHER", "w-2"))
+    journal.append(_entry("WEATHER", "w-3"))
+    feed.refresh()
+
+    entries, _ = feed.entries_since(1, "WEATHER")
+    assert [e["seq"] for e in entries] == [2, 3]
+
+def test_feed_reports_gap_when_buffer_was_exceeded(tmp_path):
+    path = str(tmp_path / "changes.jsonl")
+    journal = ChangeJournal(path)
+    for i in range(5):
+        journal.append(_entry("WEATHER", f"w-{i}"))
+
+    feed = ChangeFeed(path, buffer_size=2)
+    feed.refresh()
+    entries, gap = feed.entries_since(1, "WEATHER")
+    assert gap
+    assert [e["seq"] for e in entries] == [4, 5]
+    assert feed.entries_since(3, "WEATHER")[1] is False
+
+def test_change_notice_is_bounded_by_max_ids():
+    nodes = [{"label": "WEATHER", "id": f"w-{i}"} for i in range(10)]
+    notice = build_change_notice("merge", nodes, [], max_ids=3)
+
+    assert notice["domains"]["WEATHER"] == {"nodes": 10, "relationships": 0, "ids": ["w-0", "w-1", "w-2"],
+                                            "ids_truncated": True}
+
+def test_stream_does_not_replay_older_entries_after_reset(monkeypatch, tmp_path):
+    from src.routers import v1
+
+    path = str(tmp_path / "changes.jsonl")
+    journal = ChangeJournal(path)
+    for i in range(5):
+        journal.append(_entry("WEATHER", f"w-{i}"))
+    monkeypatch.setattr(v1, "change_feed", ChangeFeed(path, buffer_size=2))
+
+    class DisconnectedRequest:
+        async def is_disconnected(self):
+            return True
+
+    async def collect():
+        return [event async for event in v1.stream_domain_changes(DisconnectedRequest(), "WEATHER", 1)]
+
+    events = asyncio.run(collect())
+    assert len(events) == 1
+    assert events[0].startswith("id: 5\nevent: reset")
@@ -0,0 +1,54 @@
+import pytest
+from httpx import AsyncClient
+from src.data_version import DataVersionStore
+from src.main import app
+
+def test_bump_changes_only_the_bumped_domain(tmp_path):
+    store = DataVersionStore(str(tmp_path / "versions.json"))
+    weather_before, _ = store.domain_version("WEATHER")
+    health_before, _ = store.domain_version("HEALTH")
+
+    store.bump(["weather"])
+
+    assert store.domain_version("WEATHER")[0] != weather_before
+    assert store.domain_version("HEALTH")[0] == health_before
+
+def test_versions_are_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "versions.json")
+    api_store = DataVersionStore(path)
+    importer_store = DataVersionStore(path)
+    global_before, _ = api_store.global_version()
+
+    importer_store.bump(["WEATHER", "CITY"])
+
+    assert api_store.global_version()[0] != global_before
+    assert api_store.domain_version("CITY") == importer_store.domain_version("CITY")
+
+def test_epoch_changes_when_file_is_recreated(tmp_path):
+    path = tmp_path / "versions.json"
+    store = DataVersionStore(str(path))
+    token, _ = store.domain_version("WEATHER")
+
+    path.unlink()
+
+    assert DataVersionStore(str(path)).domain_version("WEATHER")[0] != token
+
+def test_path_is_read_from_the_environment_when_created(monkeypatch, tmp_path):
+    # The importer loads .env after this module has been imported
+    monkeypatch.setenv("DATA_VERSION_FILE", str(tmp_path / "custom.json"))
+    assert DataVersionStore().path == str(tmp_path / "custom.json")
+
+@pytest.mark.asyncio
+async def test_info_v1_conditional_get(monkeypatch, tmp_path):
+    from src.routers import v1
+    monkeypatch.setattr(v1, "data_versions", DataVersionStore(str(tmp_path / "versions.json")))
+
+    async with AsyncClient(app=app, base_url="http://test") as ac:
+        response = await ac.get("/v1/info")
+        etag = response.headers["ETag"]
+        assert "Last-Modified" in response.headers
+
+        not_modified = await ac.get("/v1/info", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert not_modified.content == b""
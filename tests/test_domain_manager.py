@@ -0,0 +1,44 @@
+from src import domain_manager as domain_manager_module
+from src.data_version import DataVersionStore
+
+def _worker(monkeypatch, path, loads):
+    manager = domain_manager_module.domain_manager
+
+    def load_schemas():
+        loads.append(1)
+        manager.domains["WEATHER"] = {"properties": {"temperature": "int"}, "relationships": []}
+
+    monkeypatch.setattr(domain_manager_module, "data_versions", DataVersionStore(path))
+    monkeypatch.setattr(manager, "_load_initial_schemas", load_schemas)
+    monkeypatch.setattr(manager, "domains", {})
+    monkeypatch.setattr(manager, "_synced_version", None)
+    monkeypatch.setattr(manager, "_schema_generation", None)
+    load_schemas()
+    return manager
+
+def test_deprecation_from_another_worker_is_applied(monkeypatch, tmp_path):
+    path = str(tmp_path / "versions.json")
+    manager = _worker(monkeypatch, path, [])
+    assert not manager.get_domain_schema("WEATHER").get("deprecated")
+
+    # Another worker handled the admin request
+    DataVersionStore(path).record_deprecation("weather", "2026-12-31")
+
+    assert manager.get_domain_schema("WEATHER")["deprecated"] is True
+    assert manager.get_domain_schema("WEATHER")["sunset_date"] == "2026-12-31"
+
+def test_schema_refresh_from_another_worker_reloads_schemas(monkeypatch, tmp_path):
+    path = str(tmp_path / "versions.json")
+    loads = []
+    manager = _worker(monkeypatch, path, loads)
+    DataVersionStore(path).record_deprecation("WEATHER", None)
+    manager.get_all_domains()
+    assert len(loads) == 1
+
+    DataVersionStore(path).record_schema_refresh(["WEATHER"])
+
+    assert manager.get_all_domains()["WEATHER"]["deprecated"] is True
+    assert len(loads) == 2
+    # Unchanged state doesn't trigger another reload
+    manager.get_all_domains()
+    assert len(loads) == 2
@@ -0,0 +1,162 @@
+import json
+import sys
+import threading
+import pytest
+from neo4j.exceptions import ServiceUnavailable, TransientError
+from src import importer
+from src.importer import resolve_input_paths, parse_file, ImportProfiler, Neo4jImporter, _percentile
+
+def test_resolve_input_paths_expands_directories_and_globs(tmp_path):
+    for name in ["b.json", "a.json", "notes.txt"]:
+        (tmp_path / name).write_text("{}")
+
+    assert resolve_input_paths([str(tmp_path)]) == [str(tmp_path / "a.json"), str(tmp_path / "b.json")]
+    assert resolve_input_paths([str(tmp_path / "a*.json")]) == [str(tmp_path / "a.json")]
+
+def test_resolve_input_paths_deduplicates_and_keeps_missing_files(tmp_path):
+    (tmp_path / "a.json").write_text("{}")
+    missing = str(tmp_path / "missing.json")
+
+    paths = resolve_input_paths([str(tmp_path / "a.json"), str(tmp_path), missing])
+    assert paths == [str(tmp_path / "a.json"), missing]
+
+def test_resolve_input_paths_keeps_existing_files_with_glob_characters(tmp_path):
+    (tmp_path / "station[1].json").write_text("{}")
+
+    assert resolve_input_paths([str(tmp_path / "station[1].json")]) == [str(tmp_path / "station[1].json")]
+
+def test_parse_file_applies_mappings(tmp_path):
+    data_file = tmp_path / "weather.json"
+    data_file.write_text(json.dumps([{"id": "w-1", "temp": "30"}, "not-a-record"]))
+    mappings = {"rename_fields": {"temp": "temperature"}, "type_conversions": {"temperature": "int"}}
+
+    file_path, records, error, timings = parse_file(str(data_file), mappings)
+    assert error is None
+    assert set(timings) == {"parse", "map", "max_rss_kb"}
+    assert records == [{"id": "w-1", "temperature": 30}, "not-a-record"]
+
+def test_parse_file_reports_malformed_json(tmp_path):
+    data_file = tmp_path / "broken.json"
+    data_file.write_text("{not json")
+
+    _, records, error, _ = parse_file(str(data_file), {})
+    assert records is None
+    assert "Malformed JSON" in error
+
+def test_percentile_uses_nearest_rank():
+    values = [0.1 * i for i in range(1, 11)]
+    assert _percentile(values, 50) == values[4]
+    assert _percentile(values, 99) == values[9]
+    assert _percentile([], 50) is None
+
+def test_profiler_aggregates_batches():
+    profiler = ImportProfiler()
+    profiler.record_batch("a.json", 10, 0.5, {"write_nodes": 0.3, "commit": 0.1}, retries=1, committed=True)
+    profiler.record_batch("a.json", 10, 0.2, {}, retries=0, committed=False)
+
+    assert profiler.records_written == 10
+    assert profiler.retries == 1
+    assert profiler.phases["write_nodes"] == 0.3
+    assert [b["committed"] for b in profiler.batches] == [True, False]
+
+class _FlakyCommitTransaction:
+    def __init__(self, error):
+        self.error = error
+
+    def run(self, *args, **kwargs):
+        pass
+
+    def commit(self):
+        raise self.error
+
+    def rollback(self):
+        raise AssertionError("a failed commit must not be rolled back again")
+
+class _FlakyCommitSession:
+    def __init__(self, error):
+        self.error = error
+        self.transactions = 0
+
+    def begin_transaction(self):
+        self.transactions += 1
+        return _FlakyCommitTransaction(self.error)
+
+def _importer_with_retries(max_retries):
+    # Skips __init__, which connects to Neo4j
+    neo4j_importer = Neo4jImporter.__new__(Neo4jImporter)
+    neo4j_importer.max_retries = max_retries
+    neo4j_importer.profiler = None
+    neo4j_importer.successful_imports = neo4j_importer.failed_imports = 0
+    neo4j_importer.file_stats = {"a.json": {"successful": 0, "failed": 0}}
+    neo4j_importer._stats_lock = threading.Lock()
+    return neo4j_importer
+
+def test_profiler_keeps_the_largest_parse_worker_rss():
+    profiler = ImportProfiler()
+    profiler.record_parse({"parse": 0.2, "map": 0.1, "max_rss_kb": 5000})
+    profiler.record_parse({"parse": 0.3, "map": 0.1, "max_rss_kb": 3000})
+
+    assert profiler.parse_workers_max_rss_kb == 5000
+    assert profiler.phases["parse"] == 0.5
+
+def test_failed_commit_is_only_retried_for_merge_batches():
+    batch = [{"id": "w-1"}]
+
+    session = _FlakyCommitSession(ServiceUnavailable("connection lost"))
+    _importer_with_retries(2)._process_batch(batch, "WEATHER", False, session, "a.json")
+    assert session.transactions == 1
+
+    session = _FlakyCommitSession(ServiceUnavailable("connection lost"))
+    neo4j_importer = _importer_with_retries(2)
+    neo4j_importer._process_batch(batch, "WEATHER", True, session, "a.json")
+    assert session.transactions == 3
+    assert neo4j_importer.failed_imports == 1
+
+class _DeadlockOnceTransaction:
+    def __init__(self, session):
+        self.session = session
+
+    def run(self, *args, **kwargs):
+        if self.session.transactions == 1:
+            raise TransientError("deadlock detected")
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.session.rollbacks += 1
+
+class _DeadlockOnceSession:
+    transactions = 0
+    rollbacks = 0
+
+    def begin_transaction(self):
+        self.transactions += 1
+        return _DeadlockOnceTransaction(self)
+
+class _NoopStore:
+    def bump(self, domains):
+        pass
+
+    def append(self, entry):
+        pass
+
+def test_transient_error_before_commit_is_retried_for_create_batches():
+    session = _DeadlockOnceSession()
+    neo4j_importer = _importer_with_retries(2)
+    neo4j_importer.data_versions = neo4j_importer.change_journal = _NoopStore()
+
+    neo4j_importer._process_batch([{"id": "w-1"}], "WEATHER", False, session, "a.json")
+    assert (session.transactions, session.rollbacks) == (2, 1)
+    assert neo4j_importer.successful_imports == 1
+
+def test_profile_report_must_not_overwrite_an_input_file(monkeypatch, tmp_path, caplog):
+    data_file = tmp_path / "station1.json"
+    data_file.write_text("[]")
+    monkeypatch.setattr(sys, "argv", ["importer.py", "--profile", "--profile-report", str(data_file),
+                                      str(data_file), "--domain", "WEATHER", "--uri", "bolt://x",
+                                      "--user", "u", "--password", "p"])
+    with pytest.raises(SystemExit):
+        importer.main()
+    assert "is also an input file" in caplog.text
+    assert data_file.read_text() == "[]"
@@ -0,0 +1,24 @@
+import io
+import logging
+import logging.config
+from uvicorn.config import LOGGING_CONFIG
+from src import main
+
+def test_access_log_records_are_queued_and_redacted():
+    # uvicorn configures its loggers like this before it imports the app
+    logging.config.dictConfig(LOGGING_CONFIG)
+    main.route_server_loggers()
+    output = io.StringIO()
+    original_stream = main.log_handler.setStream(output)
+    try:
+        logging.getLogger("uvicorn.access").info('%s - "%s %s HTTP/%s" %d', "203.0.113.7:51234", "GET",
+                                                  "/v1/health", "1.1", 200)
+        # Stopping the listener drains the queue
+        main.log_listener.stop()
+    finally:
+        main.log_listener.start()
+        main.log_handler.setStream(original_stream)
+
+    assert "203.0.113.7" not in output.getvalue()
+    assert '[REDACTED_IP]:51234 - "GET /v1/health HTTP/1.1" 200' in output.getvalue()
+    assert logging.getLogger("uvicorn.access").handlers == [main.queue_handler]
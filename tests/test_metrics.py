@@ -0,0 +1,22 @@
+from src.metrics import InProcessMetrics, SharedMetrics
+
+def test_in_process_rate_limit_resets_each_window():
+    metrics = InProcessMetrics()
+    assert [metrics.rate_limit_hit("10.0.0.1", 1) for _ in range(3)] == [1, 2, 3]
+    assert metrics.rate_limit_hit("10.0.0.1", 2) == 1
+    assert metrics.rate_limit_hit("10.0.0.2", 2) == 1
+
+def test_shared_metrics_are_visible_to_every_worker(tmp_path):
+    path = str(tmp_path / "metrics.db")
+    worker_a = SharedMetrics(path)
+    worker_b = SharedMetrics(path)
+
+    worker_a.increment("fatal_errors", "requests_total")
+    worker_b.increment("fatal_errors")
+    assert worker_a.snapshot() == {"fatal_errors": 1, "requests_total": 1}
+
+    # Increments are buffered per worker until the next flush
+    worker_b.flush()
+    assert worker_a.snapshot() == {"fatal_errors": 2, "requests_total": 1}
+    assert worker_a.rate_limit_hit("10.0.0.1", 5) == 1
+    assert worker_b.rate_limit_hit("10.0.0.1", 5) == 2
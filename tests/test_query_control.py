@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src.query_control import SingleFlight, DomainAdmission
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_one_execution():
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return ["node"]
+
+    results = await asyncio.gather(*(single_flight.do(("MATCH (n:WEATHER) RETURN n", ()), work) for _ in range(10)))
+    assert calls == 1
+    assert all(result == ["node"] for result in results)
+
+    # Nothing is cached once the shared execution has finished
+    await single_flight.do(("MATCH (n:WEATHER) RETURN n", ()), work)
+    assert calls == 2
+
+@pytest.mark.asyncio
+async def test_domain_admission_rejects_when_queue_is_full():
+    admission = DomainAdmission(max_concurrency=1, max_queue=1, queue_timeout=1, retry_after=3)
+    release = asyncio.Event()
+
+    async def hold_slot():
+        async with admission.slot("WEATHER"):
+            await release.wait()
+
+    holder = asyncio.create_task(hold_slot())
+    waiter = asyncio.create_task(hold_slot())
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(HTTPException) as exc_info:
+        async with admission.slot("WEATHER"):
+            pass
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "3"
+
+    # Other domains have their own limit
+    async with admission.slot("HEALTH"):
+        pass
+
+    release.set()
+    await asyncio.gather(holder, waiter)
+
+@pytest.mark.asyncio
+async def test_domain_admission_times_out_waiting_for_a_slot():
+    admission = DomainAdmission(max_concurrency=1, max_queue=5, queue_timeout=0.01)
+
+    async with admission.slot("WEATHER"):
+        with pytest.raises(HTTPException) as exc_info:
+            async with admission.slot("WEATHER"):
+                pass
+    assert exc_info.value.status_code == 503
+
+@pytest.mark.asyncio
+async def test_overload_responses_are_not_fatal_errors(caplog):
+    from starlette.requests import Request
+    from src.main import http_exception_handler
+    from src.metrics import metrics
+
+    request = Request({"type": "http", "method": "GET", "path": "/v1/query/WEATHER", "headers": [],
+                       "query_string": b"", "server": ("test", 80), "scheme": "http"})
+    before = metrics.snapshot().get("fatal_errors", 0)
+    for status_code in (503, 504):
+        response = await http_exception_handler(request, HTTPException(status_code=status_code, detail="busy"))
+        assert response.status_code == status_code
+    assert metrics.snapshot().get("fatal_errors", 0) == before
+    assert "Fatal error" not in caplog.text
+
+    await http_exception_handler(request, HTTPException(status_code=500, detail="broken"))
+    assert metrics.snapshot().get("fatal_errors", 0) == before + 1
@@ -0,0 +1,51 @@
+import pytest
+from fastapi import HTTPException
+from src.routers.v1 import build_relationship_query, relationship_property_types, coerce_filter_value, validate_identifier
+
+def test_build_relationship_query_direction_and_labels():
+    query, params = build_relationship_query("WEATHER", "out", "LOCATED_IN", "CITY", {"since": 2023}, count_only=False)
+    assert query == "MATCH (a:WEATHER)-[r:LOCATED_IN]->(b:CITY) WHERE r.since = $rel_since RETURN r"
+    assert params == {"rel_since": 2023}
+
+    query, _ = build_relationship_query("WEATHER", "in", None, None, {}, count_only=False)
+    assert query == "MATCH (a:WEATHER)<-[r]-(b) RETURN r"
+
+def test_build_relationship_query_both_directions_deduplicates():
+    query, _ = build_relationship_query("WEATHER", "both", None, None, {}, count_only=False)
+    assert query == "MATCH (a:WEATHER)-[r]-(b) RETURN DISTINCT r"
+
+    query, _ = build_relationship_query("WEATHER", "both", None, None, {}, count_only=True)
+    assert query.endswith("RETURN count(DISTINCT r) AS count")
+
+SCHEMAS = {
+    "WEATHER": {"relationships": [
+        {"type": "LOCATED_IN", "target_label": "CITY", "properties": {"since": "int"}},
+        {"type": "REPORTED_BY", "target_label": "STATION", "properties": {"verified": "bool"}},
+    ]},
+    "CITY": {"relationships": [
+        {"type": "LOCATED_IN", "target_label": "WEATHER", "properties": {"since": "str"}},
+    ]},
+    "STATION": {"relationships": [
+        {"type": "CALIBRATED_BY", "target_label": "WEATHER", "properties": {"offset": "float"}},
+    ]},
+}
+
+def test_relationship_property_types_for_outgoing_relationships():
+    assert relationship_property_types(SCHEMAS, "WEATHER", "out", "LOCATED_IN", None) == {"since": "int"}
+    assert relationship_property_types(SCHEMAS, "WEATHER", "out", None, None) == {"since": "int", "verified": "bool"}
+
+def test_relationship_property_types_for_incoming_relationships():
+    # On an incoming query the label names the source node, so the types come from that domain's schema
+    assert relationship_property_types(SCHEMAS, "WEATHER", "in", None, "CITY") == {"since": "str"}
+    assert relationship_property_types(SCHEMAS, "WEATHER", "in", None, None) == {"since": "str", "offset": "float"}
+    assert relationship_property_types(SCHEMAS, "WEATHER", "both", None, "STATION") == {"verified": "bool",
+                                                                                      "offset": "float"}
+
+def test_identifiers_and_filter_values_are_validated():
+    assert validate_identifier("LOCATED_IN", "relationship type") == "LOCATED_IN"
+    with pytest.raises(HTTPException):
+        validate_identifier("X]-(m) DETACH DELETE m //", "relationship type")
+
+    assert coerce_filter_value("since", "2023", "int") == 2023
+    with pytest.raises(HTTPException):
+        coerce_filter_value("since", "last year", "int")